@@ -38,9 +38,24 @@ Features Processed:
 from __future__ import annotations
 import argparse
 import gzip
+import io
 import os
+import re
+import sys
 from collections import defaultdict
-from typing import Dict, Iterable, List
+from typing import IO, Dict, Iterable, List, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+except ImportError:  # optional: fall back to the pure-Python scan below
+    pa = pc = pacsv = None
+
+try:
+    from isal import igzip as gzip_mod  # ISA-L inflate, API-compatible with gzip
+except ImportError:
+    gzip_mod = gzip
 
 # ---- USER MAPPING: keys => list of GFF types to collect ----
 # Keys will be used as filenames: <key>.bed
@@ -60,31 +75,51 @@ FEATURE_MAPPING: Dict[str, List[str]] = {
 # optional: additional single-feature names to export as their own file (not needed here)
 SINGLE_FEATURES = set()
 
-def open_maybe_gz(path: str):
+# mitochondrial seqid in the S288C annotation
+MITO_SEQID = "Mito"
+
+# key=value pairs of a GFF3 attributes column
+_ATTR_RE = re.compile(r"([^=;]+)=([^;]*)")
+
+# the nine GFF columns, in file order
+GFF_COLUMNS = ["seqid", "src", "ftype", "start", "end", "score", "strand", "phase", "attrs"]
+
+# read buffer for the line-by-line scan
+READ_BUFFER_SIZE = 1 << 20
+
+# BED output buffer; rows are written as they are produced and flushed in ~1 MiB chunks
+WRITE_BUFFER_SIZE = 1 << 20
+
+def open_maybe_gz(path: str) -> IO[bytes]:
+    """Open a plain or gzipped file for binary reading"""
     if path.endswith(".gz"):
-        return gzip.open(path, "rt")
-    return open(path, "r")
+        return io.BufferedReader(gzip_mod.open(path, "rb"), buffer_size=READ_BUFFER_SIZE)
+    return open(path, "rb", buffering=READ_BUFFER_SIZE)
 
 def parse_attrs(attrstr: str) -> Dict[str, str]:
     """Parse GFF attributes column into a dict. Handles key=value; tolerates '.'"""
     d = {}
-    if not attrstr or attrstr.strip() == ".":
+    if not attrstr:
+        return d
+    attrstr = attrstr.strip()
+    if attrstr == ".":
         return d
-    for part in attrstr.strip().split(";"):
+    if "=" in attrstr:
+        # GFF3: all key=value pairs in one C-level scan
+        return dict(_ATTR_RE.findall(attrstr))
+    # GFF2-style "key value" attributes
+    for part in attrstr.split(";"):
         if not part:
             continue
-        if "=" in part:
-            k, v = part.split("=", 1)
-            d[k] = v
-        elif " " in part:
+        if " " in part:
             k, v = part.split(" ", 1)
             d[k] = v.strip('"')
         else:
             d[part] = ""
     return d
 
-def build_reverse_map(mapping: Dict[str, Iterable[str]]) -> Dict[str, List[str]]:
-    """Return gff_type -> [mapping_key, ...]"""
+def build_reverse_map(mapping: Dict[str, Iterable[str]]) -> Dict[str, Tuple[str, ...]]:
+    """Return gff_type -> (mapping_key, ...) as a plain dict of tuples"""
     rev = defaultdict(list)
     for key, vals in mapping.items():
         if isinstance(vals, (list, tuple, set)):
@@ -92,7 +127,7 @@ def build_reverse_map(mapping: Dict[str, Iterable[str]]) -> Dict[str, List[str]]
                 rev[str(v)].append(key)
         else:
             rev[str(vals)].append(key)
-    return rev
+    return {k: tuple(v) for k, v in rev.items()}
 
 def choose_name(attrd: Dict[str, str], ftype: str, counter: Dict[str, int]) -> str:
     """Choose a name for the BED 'name' column using common attributes"""
@@ -102,42 +137,138 @@ def choose_name(attrd: Dict[str, str], ftype: str, counter: Dict[str, int]) -> s
         name = f"{ftype}_{counter[ftype]}"
     return name
 
-def write_beds(outdir: str, beds: Dict[str, List[List[str]]], overwrite: bool = False):
-    """Write bed lists (rows are lists of strings) to outdir as <key>.bed"""
-    os.makedirs(outdir, exist_ok=True)
-    for key, rows in beds.items():
-        outpath = os.path.join(outdir, f"{key}.bed")
-        mode = "w" if (overwrite or not os.path.exists(outpath)) else "a"
-        if mode == "a":
-            # if appending and file exists, ensure no duplicate header (we don't write headers anyway)
-            pass
-        with open(outpath, mode) as outfh:
-            for r in rows:
-                outfh.write("\t".join(r) + "\n")
-        print(f"Wrote {len(rows)} regions to {outpath}")
+def extract_name_fast(attrstr: str, ftype: str, counter: Dict[str, int]) -> str:
+    """Same result as choose_name(parse_attrs(attrstr), ...) without building the dict.
+
+    Single pass over the key=value pairs that returns on the first non-empty
+    Name; ID, IDREF and gene are remembered in case no Name turns up.
+    """
+    attrstr = attrstr.strip()
+    if "=" not in attrstr:
+        # '.' or GFF2-style attributes: take the general path
+        return choose_name(parse_attrs(attrstr), ftype, counter)
+    id_ = idref = gene = None
+    for part in attrstr.split(";"):
+        k, sep, v = part.partition("=")
+        if not sep:
+            continue
+        if k == "Name":
+            if v:
+                return v
+        elif k == "ID":
+            id_ = v
+        elif k == "IDREF":
+            idref = v
+        elif k == "gene":
+            gene = v
+    name = id_ or idref or gene or ftype
+    if not name:
+        counter[ftype] += 1
+        name = f"{ftype}_{counter[ftype]}"
+    return name
+
+def open_bed(outdir: str, key: str, overwrite: bool = False) -> IO[str]:
+    """Open <key>.bed under outdir; appends to an existing file unless overwrite"""
+    outpath = os.path.join(outdir, f"{key}.bed")
+    mode = "w" if (overwrite or not os.path.exists(outpath)) else "a"
+    return open(outpath, mode, buffering=WRITE_BUFFER_SIZE)
+
+def _read_mito_rows_arrow(gff_path: str) -> Tuple[int, List[List[str]]]:
+    """Scan the GFF with pyarrow's CSV reader and filter seqid == MITO_SEQID in Arrow.
+
+    Only the surviving mitochondrial rows are converted to Python lists.
+    Rows without exactly 9 columns are skipped by the invalid-row handler but
+    still counted like in the text reader (comment lines excepted). A Mito row
+    with more than 9 columns cannot be kept here, so such a file is re-read by
+    _read_mito_rows_text; .gz input is decompressed by pyarrow itself.
+    """
+    invalid_in = 0
+    wide_mito = False
+    mito_prefix = MITO_SEQID + "\t"
+
+    def on_invalid(row):
+        nonlocal invalid_in, wide_mito
+        if not row.text.startswith("#"):
+            invalid_in += 1
+            if row.actual_columns > len(GFF_COLUMNS) and row.text.startswith(mito_prefix):
+                wide_mito = True
+        return "skip"
+
+    read_opts = pacsv.ReadOptions(column_names=GFF_COLUMNS, skip_rows=0)
+    # GFF attributes may contain '"', so quoting must be disabled
+    parse_opts = pacsv.ParseOptions(delimiter="\t", quote_char=False,
+                                    invalid_row_handler=on_invalid)
+    # keep coordinates as strings: a malformed value on a nuclear row must not
+    # abort the whole read, and bad Mito coordinates are skipped further down
+    convert_opts = pacsv.ConvertOptions(column_types={c: pa.string() for c in GFF_COLUMNS})
 
-def extract_mito_features(gff_path: str, mapping: Dict[str, Iterable[str]],
-                          single_features: Iterable[str], outdir: str,
-                          overwrite: bool = False):
-    revmap = build_reverse_map(mapping)
-    beds: Dict[str, List[List[str]]] = defaultdict(list)
-    counters = defaultdict(int)
     total_in = 0
-    total_emitted = 0
+    rows: List[List[str]] = []
+    reader = pacsv.open_csv(gff_path, read_options=read_opts,
+                            parse_options=parse_opts, convert_options=convert_opts)
+    for batch in reader:
+        if wide_mito:
+            return _read_mito_rows_text(gff_path)
+        total_in += batch.num_rows
+        hits = batch.filter(pc.equal(batch.column("seqid"), MITO_SEQID))
+        if hits.num_rows:
+            rows.extend(map(list, zip(*(hits.column(c).to_pylist() for c in GFF_COLUMNS))))
+    if wide_mito:
+        return _read_mito_rows_text(gff_path)
+    return total_in + invalid_in, rows
+
+def _read_mito_rows_text(gff_path: str) -> Tuple[int, List[List[str]]]:
+    """Line-by-line reader, used when pyarrow is not installed and by
+    _read_mito_rows_arrow to re-read files with a Mito row of more than 9 fields.
 
+    Scans raw bytes; only the surviving mitochondrial rows are decoded.
+    """
+    mito_seqid = MITO_SEQID.encode()
+    total_in = 0
+    rows: List[List[str]] = []
     with open_maybe_gz(gff_path) as fh:
-        for lineno, raw in enumerate(fh, start=1):
-            line = raw.rstrip("\n")
-            if not line or line.startswith("#"):
+        for raw in fh:
+            line = raw[:-1] if raw.endswith(b"\n") else raw
+            if not line or line.startswith(b"#"):
                 continue
             total_in += 1
-            cols = line.split("\t")
+            # stop after the 9th field; anything past it (a 10th column) is dropped
+            cols = line.split(b"\t", 9)
             if len(cols) < 9:
                 continue
-            seqid, src, ftype, start_s, end_s, score, strand, phase, attrs = cols[:9]
-
             # **KEEP ONLY mitochondrial rows where first column EXACTLY equals "Mito"**
-            if seqid != "Mito":
+            if cols[0] != mito_seqid:
+                continue
+            rows.append([c.decode() for c in cols[:9]])
+    return total_in, rows
+
+def read_mito_rows(gff_path: str) -> Tuple[int, List[List[str]]]:
+    """Return (non-comment rows scanned, 9-column rows on the mitochondrial seqid)"""
+    if pacsv is not None:
+        return _read_mito_rows_arrow(gff_path)
+    return _read_mito_rows_text(gff_path)
+
+def extract_mito_features(gff_path: str, mapping: Dict[str, Iterable[str]],
+                          single_features: Iterable[str], outdir: str,
+                          overwrite: bool = False):
+    revmap = build_reverse_map(mapping)
+    # fold in single features not covered by the mapping, so each row needs one lookup
+    catmap = {ftype: (ftype,) for ftype in single_features}
+    catmap.update(revmap)
+    # key -> open <key>.bed; opened on the first row so unmatched keys create no file
+    handles: Dict[str, IO[str]] = {}
+    written: Dict[str, int] = defaultdict(int)
+    counters = defaultdict(int)
+    total_emitted = 0
+    os.makedirs(outdir, exist_ok=True)
+
+    total_in, mito_rows = read_mito_rows(gff_path)
+    try:
+        for seqid, src, ftype, start_s, end_s, score, strand, phase, attrs in mito_rows:
+            # find mapping categories first: unmapped rows skip all parsing below
+            cat_keys = catmap.get(ftype)
+            if cat_keys is None:
+                # not mapped -> skip
                 continue
 
             try:
@@ -149,28 +280,27 @@ def extract_mito_features(gff_path: str, mapping: Dict[str, Iterable[str]],
             bed_start = max(0, start - 1)
             bed_end = end
 
-            attrd = parse_attrs(attrs)
-            name = choose_name(attrd, ftype, counters)
+            name = extract_name_fast(attrs, ftype, counters)
             score_out = score if score != "." else "0"
             strand_out = strand if strand in {"+", "-", "."} else "."
 
-            # find mapping categories
-            cat_keys = revmap.get(ftype, []).copy()
-            if ftype in single_features and ftype not in revmap:
-                cat_keys.append(ftype)
-            if not cat_keys:
-                # not mapped -> skip
-                continue
-
+            # build bed6 line once and write it to every matching category
+            line = f"{seqid}\t{bed_start}\t{bed_end}\t{name}\t{score_out}\t{strand_out}\n"
             for key in cat_keys:
-                # build bed6 row (as strings)
-                row = [seqid, str(bed_start), str(bed_end), name, str(score_out), strand_out]
-                beds[key].append(row)
+                outfh = handles.get(key)
+                if outfh is None:
+                    outfh = handles[key] = open_bed(outdir, key, overwrite=overwrite)
+                outfh.write(line)
+                written[key] += 1
                 total_emitted += 1
+    finally:
+        for outfh in handles.values():
+            outfh.close()
 
-    write_beds(outdir, beds, overwrite=overwrite)
+    for key, n in written.items():
+        print(f"Wrote {n} regions to {handles[key].name}")
     print(f"Processed {total_in} non-comment lines from {gff_path}")
-    print(f"Emitted {total_emitted} mitochondrial regions into {len(beds)} files under {outdir}")
+    print(f"Emitted {total_emitted} mitochondrial regions into {len(handles)} files under {outdir}")
 
 def main():
     p = argparse.ArgumentParser(description="Extract mitochondrial (seqid == 'Mito') features into per-mapping BED files.")
@@ -42,6 +42,7 @@ Feature Classes:
 
 import sys
 import os
+import re
 import argparse
 from collections import defaultdict
 
@@ -83,6 +84,15 @@ SINGLE_FEATURES = set([
 
 # ---- end mapping ----
 
+# BED output buffer; rows are written as they are produced and flushed in ~1 MiB chunks
+WRITE_BUFFER_SIZE = 1 << 20
+
+# key=value pairs of a GFF3 attributes column
+_ATTR_RE = re.compile(r"([^=;]+)=([^;]*)")
+
+# Mitochondrial seqids recognised without running the is_mito() heuristic
+MITO_IDS = frozenset({"Mito", "mito", "mt", "MT", "chrM", "chrMT", "chrMt", "M"})
+
 def is_mito(seqid: str) -> bool:
     """Heuristic to decide if the seqid is mitochondrial. Adjust if needed for your assembly names."""
     if not seqid:
@@ -99,25 +109,66 @@ def is_mito(seqid: str) -> bool:
 def parse_attrs(attrstr):
     """Parse GFF attribute column into dict (supports key=value; tolerates '.' )"""
     d = {}
-    if not attrstr or attrstr.strip() == ".":
+    if not attrstr:
         return d
-    for part in attrstr.strip().split(";"):
+    attrstr = attrstr.strip()
+    if attrstr == ".":
+        return d
+    if "=" in attrstr:
+        # GFF3: all key=value pairs in one C-level scan
+        return dict(_ATTR_RE.findall(attrstr))
+    # GFF2-style "key value" attributes
+    for part in attrstr.split(";"):
         if not part:
             continue
-        if "=" in part:
-            k, v = part.split("=", 1)
-            d[k] = v
-        elif " " in part:
+        if " " in part:
             k, v = part.split(" ", 1)
             d[k] = v
         else:
             d[part] = ""
     return d
 
+def extract_name_fast(attrstr, ftype, counters):
+    """
+    Pick the BED name (Name, then ID, IDREF, gene, else ftype) in one pass over
+    the attributes, returning as soon as a non-empty Name is seen.
+    Falls back to a numbered ftype_N name when nothing usable is present.
+    """
+    attrstr = attrstr.strip()
+    if "=" not in attrstr:
+        # '.' or GFF2-style attributes: take the general path
+        attrd = parse_attrs(attrstr)
+        name = attrd.get("Name") or attrd.get("ID") or attrd.get("IDREF") or attrd.get("gene") or ftype
+    else:
+        id_ = idref = gene = None
+        name = None
+        for part in attrstr.split(";"):
+            k, sep, v = part.partition("=")
+            if not sep:
+                continue
+            if k == "Name":
+                if v:
+                    name = v
+                    break
+            elif k == "ID":
+                id_ = v
+            elif k == "IDREF":
+                idref = v
+            elif k == "gene":
+                gene = v
+        if name is None:
+            name = id_ or idref or gene or ftype
+    if not name:
+        # fallback name: ftype_counter
+        counters[ftype] += 1
+        name = f"{ftype}_{counters[ftype]}"
+    return name
+
 def build_reverse_map(feature_mapping):
     """
-    Build dict: feature_type -> list of category_keys
+    Build dict: feature_type -> tuple of category_keys
     So if a GFF type matches multiple categories, it will be placed into each category.
+    Returned as a plain dict so lookups of unmapped types allocate nothing.
     """
     rev = defaultdict(list)
     for key, vals in feature_mapping.items():
@@ -133,74 +184,31 @@ def build_reverse_map(feature_mapping):
                     rev[v].append(key)
             except Exception:
                 pass
-    return rev
+    return {k: tuple(v) for k, v in rev.items()}
 
 def gff_to_beds(gff_path, outdir, mapping, single_features=set(), skip_mito=True, overwrite=False):
     os.makedirs(outdir, exist_ok=True)
     revmap = build_reverse_map(mapping)
 
-    # containers: key -> list of bed rows (as tuples)
-    beds = defaultdict(list)
+    # output handles: key -> open <key>.bed, opened on the first row for that key
+    handles = {}
+    written = defaultdict(int)
 
     # counters for fallback names to avoid duplicate / empty names
     local_name_counters = defaultdict(int)
 
-    with open(gff_path) as fh:
-        for lineno, line in enumerate(fh, start=1):
-            if line.startswith("#"):
-                continue
-            line = line.rstrip("\n")
-            if not line:
-                continue
-            cols = line.split("\t")
-            if len(cols) < 9:
-                # skip malformed or short lines
-                continue
-            seqid, src, ftype, start_s, end_s, score, strand, phase, attrs = cols[:9]
-
-            # skip mitochondrial contigs
-            if skip_mito and is_mito(seqid):
-                continue
-
-            # convert coordinates to ints; GFF is 1-based inclusive
-            try:
-                start = int(start_s)
-                end = int(end_s)
-            except ValueError:
-                # bad coords, skip
-                continue
-            # BED 0-based half-open
-            bed_start = max(0, start - 1)
-            bed_end = end
-
-            attrd = parse_attrs(attrs)
-            name = attrd.get("Name") or attrd.get("ID") or attrd.get("IDREF") or attrd.get("gene") or ftype
-            if not name:
-                # fallback name: ftype_counter
-                local_name_counters[ftype] += 1
-                name = f"{ftype}_{local_name_counters[ftype]}"
-
-            # determine categories to emit to
-            cat_keys = revmap.get(ftype, []).copy()
-            # direct single feature matches (if present and not in mapping)
-            if ftype in single_features and ftype not in revmap:
-                cat_keys.append(ftype)
-
-            # if nothing matches, skip (we only emit functional categories)
-            if not cat_keys:
-                continue
-
-            # ensure score is valid: GFF might have '.'; use 0 if missing
-            score_out = score if score != "." else "0"
-            # ensure strand is valid
-            strand_out = strand if strand in ("+", "-", ".") else "."
+    # the scan runs on raw bytes, so lookups are keyed by bytes and only kept
+    # rows are decoded
+    # direct single feature matches (if not in mapping) are folded in here,
+    # so each line needs a single dict lookup
+    catmap = {ftype: (ftype,) for ftype in single_features}
+    catmap.update(revmap)
+    catmap_b = {ftype.encode(): keys for ftype, keys in catmap.items()}
 
-            # build bed tuple and append to each matching category
-            for key in cat_keys:
-                beds[key].append((seqid, bed_start, bed_end, name, score_out, strand_out))
+    # seqid -> is mitochondrial; each contig name pays for is_mito() at most once
+    mito_cache = {seqid.encode(): True for seqid in MITO_IDS}
 
-    # write out bed files
-    for key, rows in beds.items():
+    def open_bed(key):
         # sanitize filename
         fname = f"{key}.bed"
         outpath = os.path.join(outdir, fname)
@@ -209,10 +217,77 @@ def gff_to_beds(gff_path, outdir, mapping, single_features=set(), skip_mito=True
             mode = "a"
         else:
             mode = "w"
-        with open(outpath, mode) as outfh:
-            for r in rows:
-                outfh.write("\t".join(map(str, r)) + "\n")
-        print(f"Wrote {len(rows)} regions to {outpath}")
+        return open(outpath, mode, buffering=WRITE_BUFFER_SIZE)
+
+    try:
+        with open(gff_path, "rb") as fh:
+            for lineno, line in enumerate(fh, start=1):
+                if line.startswith(b"#"):
+                    continue
+                if line.endswith(b"\n"):
+                    line = line[:-1]
+                if not line:
+                    continue
+                # stop after the 9th field; anything past it (a 10th column) is dropped
+                cols = line.split(b"\t", 9)
+                if len(cols) < 9:
+                    # skip malformed or short lines
+                    continue
+                seqid, src, ftype, start_s, end_s, score, strand, phase, attrs = cols[:9]
+
+                # determine categories to emit to; unmapped rows skip all parsing below
+                cat_keys = catmap_b.get(ftype)
+
+                # if nothing matches, skip (we only emit functional categories)
+                if cat_keys is None:
+                    continue
+
+                # skip mitochondrial contigs
+                if skip_mito:
+                    mito = mito_cache.get(seqid)
+                    if mito is None:
+                        mito = mito_cache[seqid] = is_mito(seqid.decode())
+                    if mito:
+                        continue
+
+                # convert coordinates to ints; GFF is 1-based inclusive
+                try:
+                    start = int(start_s)
+                    end = int(end_s)
+                except ValueError:
+                    # bad coords, skip
+                    continue
+                # BED 0-based half-open
+                bed_start = max(0, start - 1)
+                bed_end = end
+
+                seqid = seqid.decode()
+                ftype = ftype.decode()
+                score = score.decode()
+                strand = strand.decode()
+                attrs = attrs.decode()
+
+                name = extract_name_fast(attrs, ftype, local_name_counters)
+
+                # ensure score is valid: GFF might have '.'; use 0 if missing
+                score_out = score if score != "." else "0"
+                # ensure strand is valid
+                strand_out = strand if strand in ("+", "-", ".") else "."
+
+                # build bed line once and write it to each matching category
+                line = f"{seqid}\t{bed_start}\t{bed_end}\t{name}\t{score_out}\t{strand_out}\n"
+                for key in cat_keys:
+                    outfh = handles.get(key)
+                    if outfh is None:
+                        outfh = handles[key] = open_bed(key)
+                    outfh.write(line)
+                    written[key] += 1
+    finally:
+        for outfh in handles.values():
+            outfh.close()
+
+    for key, n in written.items():
+        print(f"Wrote {n} regions to {handles[key].name}")
 
 def main():
     parser = argparse.ArgumentParser(description="Create regionDB BED files from a GFF using a feature mapping.")
@@ -39,8 +39,9 @@ import re
 import os
 from collections import defaultdict
 
-# Hard-coded paths
-GFF_PATH = "/home/nutticha/exo_seq/s288c_annotation_genome.gff"
+# Default paths; the GFF is the repository's data/ copy, resolved from this file
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+GFF_PATH = os.path.join(SCRIPT_DIR, "..", "..", "data", "s288c_annotation_genome.gff")
 OUTDIR = "./chr_regions/"
 
 FEATURE_MAP = {
@@ -68,6 +69,8 @@ def parse_gff(gff_path, feature_keys):
     Parse GFF and return dict: feature -> list of (chrom, start0, end)
     """
     beds = defaultdict(list)
+    # chrom -> is mitochondrial, so PAT_MITO runs once per contig name
+    mito_cache = {}
 
     with open(gff_path, "r") as fh:
         for line in fh:
@@ -82,7 +85,10 @@ def parse_gff(gff_path, feature_keys):
             feature = cols[2].strip()
 
             # skip mitochondrial contigs
-            if PAT_MITO.search(chrom):
+            mito = mito_cache.get(chrom)
+            if mito is None:
+                mito = mito_cache[chrom] = PAT_MITO.search(chrom) is not None
+            if mito:
                 continue
 
             try:
@@ -98,15 +104,26 @@ def parse_gff(gff_path, feature_keys):
     return beds
 
 
+# numbered chromosome names ("1", "chr12") sort numerically before all others
+PAT_CHROM_NUM = re.compile(r"^(?:chr)?(\d+)$")
+
+
+def chrom_key(c):
+    m = PAT_CHROM_NUM.match(c)
+    if m:
+        return (0, int(m.group(1)))
+    return (1, c)
+
+
 def sort_bed(entries):
     """Sort entries by chromosome and start coordinate."""
-    def chrom_key(c):
-        m = re.match(r"^(?:chr)?(\d+)$", c)
-        if m:
-            return (0, int(m.group(1)))
-        return (1, c)
+    # rank each distinct chromosome once, then sort on plain int keys
+    # ("2" and "chr2" share a key, so they share a rank)
+    keys = {c: chrom_key(c) for c in {e[0] for e in entries}}
+    key_rank = {k: i for i, k in enumerate(sorted(set(keys.values())))}
+    rank = {c: key_rank[k] for c, k in keys.items()}
 
-    return sorted(entries, key=lambda x: (chrom_key(x[0]), x[1], x[2]))
+    return sorted(entries, key=lambda x: (rank[x[0]], x[1], x[2]))
 
 
 def write_bed(path, entries):
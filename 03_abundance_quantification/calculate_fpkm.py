@@ -32,25 +32,66 @@ Output:
 
 import os
 import glob
+import json
+import numpy as np
 import pandas as pd
 import configparser
 import sys
 import subprocess
+import multiprocessing as mp
 from datetime import datetime
 
-# Print script information
-print("="*60)
-print("FPKM Calculation for EV-seq Analysis")
-print("Version 1.0.0")
-print(f"Execution time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-print("="*60)
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+except ImportError:  # optional: fall back to pandas in process_counts()
+    pa = pc = pacsv = None
 
 # -----------------------------
 # Get total mapped reads from BAM file
 # -----------------------------
+def _mapped_reads_idxstats(bam_file):
+    """Sum column 3 (mapped reads) of samtools idxstats; reads only the BAM index"""
+    result = subprocess.run(
+        ["samtools", "idxstats", bam_file],
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return sum(int(line.split("\t")[2]) for line in result.stdout.splitlines() if line)
+
+
+def _mapped_reads_flagstat(bam_file):
+    """Mapped reads (QC-passed + QC-failed) from samtools flagstat JSON output"""
+    result = subprocess.run(
+        ["samtools", "flagstat", "--output-fmt", "json", bam_file],
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    stats = json.loads(result.stdout)
+    return sum(stats[k]["mapped"] for k in ("QC-passed reads", "QC-failed reads") if k in stats)
+
+
+def _mapped_reads_view(bam_file):
+    """Count mapped reads with samtools view -c -F 4 (full scan of the BAM)"""
+    result = subprocess.run(
+        ["samtools", "view", "-c", "-F", "4", bam_file],
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return int(result.stdout.strip())
+
+
 def get_total_mapped_reads(bam_file="aligned.mapped.sorted.bam"):
     """
     Get total mapped reads from BAM file using samtools
+
+    Tries the cheap index-based idxstats first, then flagstat, and only
+    falls back to a full samtools view scan if neither works (e.g. no .bai).
+    All three count every record without the unmapped flag, like -F 4.
     
     Args:
         bam_file (str): Path to BAM file
@@ -58,162 +99,269 @@ def get_total_mapped_reads(bam_file="aligned.mapped.sorted.bam"):
     Returns:
         int: Total number of mapped reads
     """
-    try:
-        # Run samtools view -c -F 4 to count mapped reads
-        result = subprocess.run(
-            ["samtools", "view", "-c", "-F", "4", bam_file],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        total_reads = int(result.stdout.strip())
+    last_error = None
+    for counter in (_mapped_reads_idxstats, _mapped_reads_flagstat, _mapped_reads_view):
+        try:
+            total_reads = counter(bam_file)
+        except FileNotFoundError:
+            print("Error: samtools not found. Please install samtools or add it to PATH")
+            sys.exit(1)
+        except (subprocess.CalledProcessError, ValueError, KeyError, IndexError) as e:
+            last_error = e
+            continue
         print(f"Total mapped reads from {bam_file}: {total_reads:,}")
         return total_reads
-        
-    except subprocess.CalledProcessError as e:
-        print(f"Error running samtools: {e}")
-        print("Make sure samtools is installed and BAM file exists")
-        sys.exit(1)
-    except ValueError as e:
-        print(f"Error parsing samtools output: {e}")
-        sys.exit(1)
-    except FileNotFoundError:
-        print("Error: samtools not found. Please install samtools or add it to PATH")
-        sys.exit(1)
 
-# Get total mapped reads from BAM file
-TOTAL_MAPPED_READS = get_total_mapped_reads()
-
-# Also try to get from config as fallback (for documentation purposes)
-config = configparser.ConfigParser()
-config_path = '../config.ini'
-
-if os.path.exists(config_path):
-    config.read(config_path)
-    try:
-        config_reads = int(config.get('fpkm_calculation', 'total_mapped_reads', fallback='0'))
-        if config_reads > 0:
-            print(f"Config file specifies: {config_reads:,} reads")
-            if abs(TOTAL_MAPPED_READS - config_reads) > 1000:  # Allow small differences
-                print(f"Warning: BAM file read count differs from config by {abs(TOTAL_MAPPED_READS - config_reads):,}")
-    except (ValueError, configparser.Error):
-        pass
+    if isinstance(last_error, subprocess.CalledProcessError):
+        print(f"Error running samtools: {last_error}")
+        print("Make sure samtools is installed and BAM file exists")
+    else:
+        print(f"Error parsing samtools output: {last_error}")
+    sys.exit(1)
 
 # -----------------------------
-# Validate input directories
+# Input / output locations
 # -----------------------------
 COUNTS_DIR = "coverage_count"
 OUT_DIR = "fpkm_out"
 
-if not os.path.exists(COUNTS_DIR):
-    print(f"Error: Input directory '{COUNTS_DIR}' not found")
-    print("Please ensure read count files are available in the coverage_count directory")
-    sys.exit(1)
+# bedtools coverage output: BED6 + reads, bases covered, region length, fraction covered
+COUNTS_COLUMNS = [
+    "chr",
+    "start",
+    "end",
+    "name",
+    "score",
+    "strand",
+    "reads",
+    "bases_covered",
+    "region_length",
+    "fraction_covered"
+]
 
-os.makedirs(OUT_DIR, exist_ok=True)
-print(f"Output directory: {OUT_DIR}")
+# fraction_covered is not carried into the output, so it is never parsed
+COUNTS_USECOLS = COUNTS_COLUMNS[:-1]
 
-# Check for input files
-count_files = glob.glob(os.path.join(COUNTS_DIR, "*.counts"))
-if not count_files:
-    print(f"Error: No count files (*.counts) found in {COUNTS_DIR}")
-    sys.exit(1)
-    
-print(f"Found {len(count_files)} count files to process")
-print(f"Using total mapped reads: {TOTAL_MAPPED_READS:,}")
+COUNTS_DTYPES = {
+    "chr": "category",
+    "start": "int32",
+    "end": "int32",
+    "name": "object",
+    "score": "object",
+    "strand": "object",
+    "reads": "int64",
+    "bases_covered": "int64",
+    "region_length": "int64"
+}
 
-# -----------------------------
-# Store class-level summary
-# -----------------------------
-class_summary = []
+# Per-region output columns
+FPKM_COLUMNS = COUNTS_USECOLS + ["FPKM"]
 
-# -----------------------------
-# Loop over all *.counts files
-# -----------------------------
-for counts_file in glob.glob(os.path.join(COUNTS_DIR, "*.counts")):
+# Set in each worker by init_worker() so it is not pickled with every task
+TOTAL_MAPPED_READS = None
+
+
+def init_worker(total_mapped_reads):
+    """Pool initializer: share the library size with the worker process"""
+    global TOTAL_MAPPED_READS
+    TOTAL_MAPPED_READS = total_mapped_reads
+
+
+def _fpkm_arrow(counts_file, out_csv):
+    """
+    Stream a counts file through pyarrow: FPKM is computed per record batch
+    and each batch is written out immediately, so the whole table is never
+    held in memory.
+
+    Returns:
+        tuple: (total reads, total region length) over regions with length > 0
+    """
+    read_opts = pacsv.ReadOptions(column_names=COUNTS_COLUMNS)
+    parse_opts = pacsv.ParseOptions(delimiter="\t", quote_char=False)
+    convert_opts = pacsv.ConvertOptions(
+        column_types={
+            "chr": pa.string(),
+            "start": pa.int64(),
+            "end": pa.int64(),
+            "name": pa.string(),
+            "score": pa.string(),
+            "strand": pa.string(),
+            "reads": pa.int64(),
+            "bases_covered": pa.int64(),
+            "region_length": pa.int64()
+        },
+        include_columns=COUNTS_USECOLS
+    )
+    total_mapped = float(TOTAL_MAPPED_READS)
+    total_reads = 0
+    total_length = 0
+
+    # batches are written through DataFrame.to_csv so the output is byte-identical
+    # to the pandas path (pyarrow's CSV writer quotes strings and prints 0.0 as 0)
+    with open(out_csv, "w", newline="") as fh:
+        header = True
+        for batch in pacsv.open_csv(counts_file, read_options=read_opts,
+                                    parse_options=parse_opts, convert_options=convert_opts):
+            # Avoid division by zero
+            batch = batch.filter(pc.greater(batch.column("region_length"), 0))
+            reads = batch.column("reads")
+            lengths = batch.column("region_length")
+
+            fpkm = pc.divide(
+                pc.multiply(pc.cast(reads, pa.float64()), 1e9),
+                pc.multiply(pc.cast(lengths, pa.float64()), total_mapped)
+            )
+            out = pa.RecordBatch.from_arrays(batch.columns + [fpkm], names=FPKM_COLUMNS)
+
+            out.to_pandas().to_csv(fh, index=False, header=header)
+            header = False
+
+            total_reads += pc.sum(reads).as_py() or 0
+            total_length += pc.sum(lengths).as_py() or 0
+
+    return total_reads, total_length
 
-    feature_class = os.path.basename(counts_file).replace(".counts", "")
-    print(f"Processing {feature_class}")
 
+def _fpkm_pandas(counts_file, out_csv):
+    """
+    pandas version of _fpkm_arrow, used when pyarrow is not installed
+
+    Returns:
+        tuple: (total reads, total region length) over regions with length > 0
+    """
     # Read counts file
     df = pd.read_csv(
         counts_file,
         sep="\t",
         header=None,
-        names=[
-            "chr",
-            "start",
-            "end",
-            "name",
-            "score",
-            "strand",
-            "reads",
-            "bases_covered",
-            "region_length",
-            "fraction_covered"
-        ]
+        names=COUNTS_COLUMNS,
+        usecols=COUNTS_USECOLS,
+        dtype=COUNTS_DTYPES,
+        engine="c"
     )
 
-    # Avoid division by zero
-    df = df[df["region_length"] > 0].copy()
+    # Avoid division by zero; boolean indexing already yields a new frame,
+    # so no extra .copy() is needed
+    mask = df["region_length"].to_numpy() > 0
+    valid = df if mask.all() else df[mask]
 
     # -----------------------------
     # Per-region FPKM
     # -----------------------------
-    df["FPKM"] = (
-        df["reads"] * 1e9
-    ) / (
-        df["region_length"] * TOTAL_MAPPED_READS
-    )
+    reads = valid["reads"].to_numpy(dtype=np.float64)
+    lengths = valid["region_length"].to_numpy(dtype=np.float64)
+    fpkm = (reads * 1e9) / (lengths * TOTAL_MAPPED_READS)
 
     # -----------------------------
     # Write per-region output
     # -----------------------------
+    # columns are already in FPKM_COLUMNS order; FPKM is appended last
+    valid.assign(FPKM=fpkm).to_csv(out_csv, index=False)
+
+    return int(valid["reads"].sum()), int(valid["region_length"].sum())
+
+
+def process_counts(counts_file):
+    """
+    Compute per-region FPKM for one *.counts file and write it to OUT_DIR
+
+    Args:
+        counts_file (str): Path to a bedtools coverage *.counts file
+
+    Returns:
+        dict: Feature-class (pooled) summary row
+    """
+    feature_class = os.path.basename(counts_file).replace(".counts", "")
+    print(f"Processing {feature_class}")
+
     out_csv = os.path.join(OUT_DIR, f"{feature_class}_fpkm.csv")
-    df_out = df[
-        [
-            "chr",
-            "start",
-            "end",
-            "name",
-            "score",
-            "strand",
-            "reads",
-            "bases_covered",
-            "region_length",
-            "FPKM"
-        ]
-    ]
-
-    df_out.to_csv(out_csv, index=False)
+    if pacsv is not None:
+        total_reads, total_length = _fpkm_arrow(counts_file, out_csv)
+    else:
+        total_reads, total_length = _fpkm_pandas(counts_file, out_csv)
 
     # -----------------------------
     # Feature-class (pooled) FPKM
     # -----------------------------
-    total_reads = df["reads"].sum()
-    total_length = df["region_length"].sum()
-
     class_fpkm = (
         total_reads * 1e9
     ) / (
         total_length * TOTAL_MAPPED_READS
     ) if total_length > 0 else 0
 
-    class_summary.append({
+    return {
         "feature_class": feature_class,
-        "total_reads": int(total_reads),
-        "total_length": int(total_length),
+        "total_reads": total_reads,
+        "total_length": total_length,
         "FPKM": class_fpkm
-    })
+    }
 
-# -----------------------------
-# Write class-level summary
-# -----------------------------
-summary_df = pd.DataFrame(class_summary)
-summary_df.to_csv(
-    os.path.join(OUT_DIR, "feature_class_FPKM_summary.csv"),
-    index=False
-)
 
-print("FPKM calculation completed successfully.")
+def main():
+    # Print script information
+    print("="*60)
+    print("FPKM Calculation for EV-seq Analysis")
+    print("Version 1.0.0")
+    print(f"Execution time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print("="*60)
+
+    # Get total mapped reads from BAM file
+    total_mapped_reads = get_total_mapped_reads()
+
+    # Also try to get from config as fallback (for documentation purposes)
+    config = configparser.ConfigParser()
+    config_path = '../config.ini'
+
+    if os.path.exists(config_path):
+        config.read(config_path)
+        try:
+            config_reads = int(config.get('fpkm_calculation', 'total_mapped_reads', fallback='0'))
+            if config_reads > 0:
+                print(f"Config file specifies: {config_reads:,} reads")
+                if abs(total_mapped_reads - config_reads) > 1000:  # Allow small differences
+                    print(f"Warning: BAM file read count differs from config by {abs(total_mapped_reads - config_reads):,}")
+        except (ValueError, configparser.Error):
+            pass
+
+    # -----------------------------
+    # Validate input directories
+    # -----------------------------
+    if not os.path.exists(COUNTS_DIR):
+        print(f"Error: Input directory '{COUNTS_DIR}' not found")
+        print("Please ensure read count files are available in the coverage_count directory")
+        sys.exit(1)
+
+    os.makedirs(OUT_DIR, exist_ok=True)
+    print(f"Output directory: {OUT_DIR}")
+
+    # Check for input files (listed once; sorted so output order is deterministic)
+    count_files = sorted(glob.iglob(os.path.join(COUNTS_DIR, "*.counts")))
+    if not count_files:
+        print(f"Error: No count files (*.counts) found in {COUNTS_DIR}")
+        sys.exit(1)
+    
+    print(f"Found {len(count_files)} count files to process")
+    print(f"Using total mapped reads: {total_mapped_reads:,}")
+
+    # -----------------------------
+    # Process *.counts files in parallel (one task per file)
+    # -----------------------------
+    n_workers = min(os.cpu_count() or 1, len(count_files))
+    with mp.Pool(n_workers, initializer=init_worker, initargs=(total_mapped_reads,)) as pool:
+        # imap keeps the summary rows in input-file order
+        class_summary = list(pool.imap(process_counts, count_files))
+
+    # -----------------------------
+    # Write class-level summary
+    # -----------------------------
+    summary_df = pd.DataFrame(class_summary)
+    summary_df.to_csv(
+        os.path.join(OUT_DIR, "feature_class_FPKM_summary.csv"),
+        index=False
+    )
+
+    print("FPKM calculation completed successfully.")
+
 
+if __name__ == "__main__":
+    main()
@@ -32,7 +32,7 @@ Requirements:
     - scipy >= 1.7.0
 
 Input:
-    - merged_CPM_table.csv (generated by merge_file.py)
+    - merged_CPM_table.parquet or merged_CPM_table.csv (generated by merge_file.py)
 
 Output:
     - Correlation statistics and p-values
@@ -57,24 +57,34 @@ print("="*60)
 # -----------------------------
 # Load and validate data
 # -----------------------------
-# Input data file
-data_file = "merged_CPM_table.csv"
-data_folder_file = "../data/merged_CPM_table.csv"
-
-# Check for data file in current directory first, then data folder
-if os.path.exists(data_file):
-    input_path = data_file
-elif os.path.exists(data_folder_file):
-    input_path = data_folder_file
-    print(f"Using data file from data directory: {data_folder_file}")
+# Input data file: merge_file.py writes Parquet by default, CSV with --csv
+data_files = ["merged_CPM_table.parquet", "merged_CPM_table.csv"]
+# merge_file.py also writes to the repository's data folder; this script lives
+# in 03_abundance_quantification/compare_gene_high_express/
+script_dir = os.path.dirname(os.path.abspath(__file__))
+repo_root = os.path.dirname(os.path.dirname(script_dir))
+data_folder_files = [os.path.join(repo_root, "data", f) for f in data_files]
+
+# Check for data file in current directory first, then data folder; if both
+# formats are present, the more recently written one is used
+local_files = [f for f in data_files if os.path.exists(f)]
+folder_files = [f for f in data_folder_files if os.path.exists(f)]
+if local_files:
+    input_path = max(local_files, key=os.path.getmtime)
+elif folder_files:
+    input_path = max(folder_files, key=os.path.getmtime)
+    print(f"Using data file from data directory: {input_path}")
 else:
     print(f"Error: Data file not found")
-    print(f"Looked for: {data_file} and {data_folder_file}")
+    print(f"Looked for: {', '.join(data_files + data_folder_files)}")
     print("Please ensure the merged CPM table has been generated using merge_file.py")
     sys.exit(1)
 
 try:
-    df = pd.read_csv(input_path)
+    if input_path.endswith(".parquet"):
+        df = pd.read_parquet(input_path)
+    else:
+        df = pd.read_csv(input_path)
     print(f"Loaded data from {input_path}: {df.shape[0]} features, {df.shape[1]} columns")
 except Exception as e:
     print(f"Error loading data file: {e}")
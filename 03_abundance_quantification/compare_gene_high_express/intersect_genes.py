@@ -14,10 +14,15 @@ def main(file1, file2, out_file, left_col, right_col):
     if right_col not in df2.columns:
         sys.exit(f"ERROR: Column '{right_col}' not found in {file2}")
 
+    # Intersect the gene IDs first, then join only the rows that survive
+    common = set(df1[left_col]).intersection(df2[right_col])
+    df1_common = df1[df1[left_col].isin(common)]
+    df2_common = df2[df2[right_col].isin(common)]
+
     # Merge intersecting genes
     merged = pd.merge(
-        df1,
-        df2,
+        df1_common,
+        df2_common,
         left_on=left_col,
         right_on=right_col,
         how="inner"
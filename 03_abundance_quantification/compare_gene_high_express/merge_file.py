@@ -19,14 +19,16 @@ Purpose:
 4. Prepare merged table for correlation analysis
 
 Usage:
-    python merge_file.py
+    python merge_file.py          # writes merged_CPM_table.parquet
+    python merge_file.py --csv    # writes merged_CPM_table.csv
 
 Input:
     - EV-seq FPKM table (data/gene_fpkm.csv)
     - RNA-seq count table (data/srr5658399_count_with_length.xlsx)
 
 Output:
-    - merged_CPM_table.csv: Combined CPM and FPKM data for correlation analysis
+    - merged_CPM_table.parquet (or .csv with --csv, or when pyarrow is not
+      installed): Combined CPM and FPKM data for correlation analysis
 
 CPM Calculation:
     CPM = (feature_count / total_mapped_reads) × 1,000,000
@@ -37,13 +39,112 @@ FPKM Calculation:
 Requirements:
     - pandas >= 1.3.0
     - openpyxl (for Excel file reading)
+    - pyarrow (optional; Parquet output, faster EV-seq CSV parsing and a
+      Parquet cache of the parsed Excel sheet)
 """
 
+import numpy as np
 import pandas as pd
+import argparse
 import sys
 import os
+import shutil
 from datetime import datetime
 
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:  # optional: fall back to pd.read_csv for the EV-seq table
+    pa = pacsv = None
+
+
+def merge_cpm_fpkm(ev_df, srr_df):
+    """
+    Compute CPM and FPKM for the EV-seq and RNA-seq tables and inner-join them
+    by gene ID. The input frames are not modified.
+
+    Args:
+        ev_df (pd.DataFrame): EV-seq table with name, reads and region_length
+        srr_df (pd.DataFrame): RNA-seq table with gene_id, count and region_length
+
+    Returns:
+        pd.DataFrame: Merged table in EV-seq row order
+
+    Raises:
+        ValueError: If either table has duplicated gene IDs
+    """
+    # Totals are plain NumPy reductions (read counts are non-null integers) and
+    # scalars are folded first so each column is one multiply (and one divide
+    # for FPKM) on the underlying NumPy arrays
+    # EV-seq CPM
+    ev_reads = ev_df["reads"].to_numpy()
+    ev_lengths = ev_df["region_length"].to_numpy()
+    ev_total = int(ev_reads.sum(dtype=np.int64))
+    ev_cpm = ev_reads * (1e6 / ev_total)
+
+    # SRR RNA-seq CPM
+    srr_counts = srr_df["count"].to_numpy()
+    srr_total = int(srr_counts.sum(dtype=np.int64))
+    srr_cpm = srr_counts * (1e6 / srr_total)
+
+    # EV-seq FPKM: FPKM = (reads * 1,000,000,000) / (gene_length * total_reads)
+    ev_fpkm = ev_reads * (1e9 / ev_total) / ev_lengths
+
+    # SRR RNA-seq FPKM
+    srr_fpkm = srr_counts * (1e9 / srr_total) / srr_df["region_length"].to_numpy()
+
+    # Both keys share one set of categories, so the join compares integer
+    # codes instead of hashing gene-ID strings
+    cats = pd.Index(ev_df["name"].unique()).union(srr_df["gene_id"].unique())
+    ev_names = pd.Categorical(ev_df["name"], categories=cats)
+    srr_ids = pd.Categorical(srr_df["gene_id"], categories=cats)
+
+    # Rows whose ID is missing from the other table are dropped up front (on the
+    # category codes) so the join only indexes the overlapping genes
+    shared = np.intersect1d(ev_names.codes, srr_ids.codes)
+    ev_keep = np.isin(ev_names.codes, shared)
+    srr_keep = np.isin(srr_ids.codes, shared)
+
+    # Join on the gene-ID indexes rather than on columns: gene_id is unique, so
+    # the join is an index alignment and skips merge's key factorization.
+    # Inner join keeps EV-seq order; gene_id is also kept as a column for output.
+    ev_small = pd.DataFrame(
+        {
+            "region_length": ev_lengths[ev_keep],
+            "reads": ev_reads[ev_keep],
+            "cpm_evseq": ev_cpm[ev_keep],
+            "fpkm_evseq": ev_fpkm[ev_keep]
+        },
+        index=pd.CategoricalIndex(ev_names[ev_keep], name="name")
+    )
+    srr_small = pd.DataFrame(
+        {
+            "gene_id": srr_ids[srr_keep],
+            "count": srr_counts[srr_keep],
+            "cpm_srr": srr_cpm[srr_keep],
+            "fpkm_srr": srr_fpkm[srr_keep]
+        },
+        index=pd.CategoricalIndex(srr_ids[srr_keep], name="gene_id")
+    )
+    # One-to-one check (join has no validate= on pandas 1.3); a duplicated ID
+    # would otherwise silently multiply rows
+    for label, index in (("EV-seq name", ev_small.index), ("RNA-seq gene_id", srr_small.index)):
+        if not index.is_unique:
+            raise ValueError(f"Duplicate {label} values: {list(index[index.duplicated()].unique()[:5])}")
+    merged_df = ev_small.join(srr_small, how="inner", sort=False)
+    merged_df.index.name = "name"
+    merged_df = merged_df.reset_index()
+    # categorical keys were only needed for the join; output plain ID strings
+    merged_df["name"] = merged_df["name"].astype(str)
+    merged_df["gene_id"] = merged_df["gene_id"].astype(str)
+    return merged_df
+
+
+parser = argparse.ArgumentParser(description="Merge EV-seq and RNA-seq tables with CPM/FPKM")
+parser.add_argument("--csv", action="store_true",
+                    help="Write merged_CPM_table.csv instead of merged_CPM_table.parquet")
+args = parser.parse_args()
+
 # Print script information
 print("="*60)
 print("EV-seq and RNA-seq Data Merger")
@@ -54,9 +155,10 @@ print("="*60)
 # -----------------------------
 # 1. Load input count tables
 # -----------------------------
-# Use relative paths to data folder
+# Use relative paths to the repository's data folder
+# (this script lives in 03_abundance_quantification/compare_gene_high_express/)
 script_dir = os.path.dirname(os.path.abspath(__file__))
-repo_root = os.path.dirname(script_dir)
+repo_root = os.path.dirname(os.path.dirname(script_dir))
 
 ev_file_path = os.path.join(repo_root, "data", "gene_fpkm.csv")
 srr_file_path = os.path.join(repo_root, "data", "srr5658399_count_with_lenght.xlsx")
@@ -75,51 +177,79 @@ if not os.path.exists(srr_file_path):
 print(f"Loading EV-seq data from: {ev_file_path}")
 print(f"Loading RNA-seq data from: {srr_file_path}")
 
-ev_df = pd.read_csv(ev_file_path)     # columns: gene, EV_count
-srr_df = pd.read_excel(srr_file_path)      # columns: gene, SRR_exp
-
-# -----------------------------
-# 2. Calculate CPM for each dataset
-# -----------------------------
-# EV-seq CPM
-ev_total = ev_df["reads"].sum()
-ev_df["cpm_evseq"] = (ev_df["reads"] / ev_total) * 1e6
-
-# SRR RNA-seq CPM
-srr_total = srr_df["count"].sum()
-srr_df["cpm_srr"] = (srr_df["count"] / srr_total) * 1e6
-
-# -----------------------------
-# 3. Calculate FPKM for each dataset
-# -----------------------------
-# EV-seq FPKM: FPKM = (reads * 1,000,000,000) / (gene_length * total_reads)
-ev_df["fpkm_evseq"] = (ev_df["reads"] * 1e9) / (ev_df["region_length"] * ev_total)
-
-# SRR RNA-seq FPKM
-srr_df["fpkm_srr"] = (srr_df["count"] * 1e9) / (srr_df["region_length"] * srr_total)
-
+# Only the columns used below are parsed; the Excel sheet is the slowest input
+if pacsv is not None:
+    # Multi-threaded Arrow parser, converted to NumPy-backed columns
+    ev_df = pacsv.read_csv(
+        ev_file_path,
+        convert_options=pacsv.ConvertOptions(
+            include_columns=["name", "reads", "region_length"],
+            column_types={"name": pa.string(), "reads": pa.int64(), "region_length": pa.int64()}
+        )
+    ).to_pandas()
+else:
+    ev_df = pd.read_csv(
+        ev_file_path,
+        usecols=["name", "reads", "region_length"],
+        dtype={"reads": "int64", "region_length": "int64"}
+    )
+# The parsed Excel sheet is cached as Parquet next to it and reused while the
+# cache is at least as new as the .xlsx (needs pyarrow; skipped otherwise)
+srr_cache_path = srr_file_path + ".parquet"
+srr_df = None
+if (os.path.exists(srr_cache_path)
+        and os.path.getmtime(srr_cache_path) >= os.path.getmtime(srr_file_path)):
+    try:
+        srr_df = pd.read_parquet(srr_cache_path, columns=["gene_id", "count", "region_length"])
+        print(f"Using cached RNA-seq table: {srr_cache_path}")
+    except ImportError:
+        pass
+    except Exception as e:  # unreadable/truncated cache: rebuild it from the .xlsx
+        print(f"Ignoring unreadable cache {srr_cache_path}: {e}")
+if srr_df is None:
+    srr_df = pd.read_excel(
+        srr_file_path,
+        usecols=["gene_id", "count", "region_length"],
+        engine="openpyxl",
+        dtype={"count": "int64", "region_length": "int64"}
+    )
+    # write to a temporary file and rename it into place, so an interrupted
+    # write never leaves a partial cache behind
+    tmp_cache_path = f"{srr_cache_path}.{os.getpid()}.tmp"
+    try:
+        srr_df.to_parquet(tmp_cache_path, index=False)
+        os.replace(tmp_cache_path, srr_cache_path)
+    except (ImportError, OSError):
+        pass
+    finally:
+        if os.path.exists(tmp_cache_path):
+            os.remove(tmp_cache_path)
 
 # -----------------------------
-# 4. Merge tables by gene ID
+# 2-4. Calculate CPM/FPKM and merge by gene ID
 # -----------------------------
-merged_df = pd.merge(
-    ev_df[["name", "region_length", "reads", "cpm_evseq", "fpkm_evseq"]],
-    srr_df[["gene_id", "count", "cpm_srr", "fpkm_srr"]],
-    left_on="name",
-    right_on="gene_id",
-    how="inner"   # use "outer" to keep all genes
-)
-#merged_df[merged_df[["cpm_evseq", "cpm_srr"]].isna().any(axis=1)]
+merged_df = merge_cpm_fpkm(ev_df, srr_df)
 
 # -----------------------------
 # 4. Save output
 # -----------------------------
-output_file = "merged_CPM_table.csv"
+# Parquet by default (no per-cell float formatting, smaller file); CSV on
+# request or when no Parquet engine is installed
+write_csv = args.csv or pa is None
+if not args.csv and pa is None:
+    print("pyarrow not installed; writing CSV instead of Parquet")
+output_file = "merged_CPM_table.csv" if write_csv else "merged_CPM_table.parquet"
 data_output = os.path.join(repo_root, "data", output_file)
 
-# Save in both current directory and data folder for flexibility
-merged_df.to_csv(output_file, index=False)
-merged_df.to_csv(data_output, index=False)
+# Save in both current directory and data folder for flexibility; the table is
+# serialized once and the file copied to the second location
+if write_csv:
+    merged_df.to_csv(data_output, index=False)
+else:
+    merged_df.to_parquet(data_output, index=False, compression="snappy")
+# (run from data/ itself, both paths are the same file and there is nothing to copy)
+if not (os.path.exists(output_file) and os.path.samefile(data_output, output_file)):
+    shutil.copyfile(data_output, output_file)
 
 print(f"Merged CPM table saved as {output_file}")
 print(f"Also saved to {data_output}")
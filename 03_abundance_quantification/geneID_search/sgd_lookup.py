@@ -44,15 +44,90 @@ API:
 
 Requirements:
     - requests >= 2.25.0
+    - httpx >= 0.23.0 (optional; async queries, else a requests thread pool)
+    - tqdm (optional; progress bar while querying)
     - pandas >= 1.3.0
     - Internet connection for SGD API access
 """
 import os
 import sys
 import argparse
+import asyncio
+import json
+import sqlite3
 import requests
 import pandas as pd
 import time
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import httpx  # optional: concurrent lookups via asyncio
+except ImportError:
+    httpx = None
+
+try:
+    from tqdm import tqdm  # optional: progress bar for the per-gene queries
+except ImportError:
+    tqdm = None
+
+SGD_LOCUS_URL = "https://www.yeastgenome.org/backend/locus/{}"
+SGD_HEADERS = {"accept": "application/json"}
+# Without tqdm, per-gene progress is logged to stderr every PROGRESS_EVERY genes
+PROGRESS_EVERY = 50
+# Batch locus endpoint, tried first (only with --bulk) with BULK_CHUNK_SIZE genes
+# per POST. SGD does not document one; if the reply is not a JSON object keyed
+# by the requested loci, the per-gene GETs are used
+SGD_BULK_URL = "https://www.yeastgenome.org/backend/locus_bulk"
+BULK_CHUNK_SIZE = 200
+
+# Concurrent lookups in flight (async tasks, or worker threads without httpx);
+# kept low to stay under SGD rate limits
+MAX_CONCURRENT_QUERIES = 15
+# Pause each async slot takes after a query, so at most ~MAX_CONCURRENT_QUERIES / 0.2 req/s
+QUERY_INTERVAL = 0.2
+# Transient server errors are retried (both paths) up to MAX_RETRIES times,
+# waiting RETRY_BACKOFF * 2**n seconds before retry n
+RETRY_STATUSES = (500, 502, 503, 504)
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.3
+
+
+def make_session():
+    """
+    requests session shared by all sync queries: keeps the TLS connection to
+    SGD alive between genes and retries transient 5xx responses with backoff
+    """
+    session = requests.Session()
+    session.headers.update(SGD_HEADERS)
+    retries = Retry(
+        total=MAX_RETRIES,
+        backoff_factor=RETRY_BACKOFF,
+        status_forcelist=RETRY_STATUSES,
+        raise_on_status=False  # hand back the last response; non-200 counts as not found
+    )
+    adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=retries)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+_SESSION = make_session()
+
+# Output columns, one row per gene found (see parse_locus)
+OUTPUT_COLUMNS = [
+    "query_name",
+    "sgdid",
+    "systematic_name",
+    "gene_name",
+    "format_name",
+    "description"
+]
+
+# On-disk cache of successful lookups, so re-runs only query new genes
+DEFAULT_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sgd_cache.sqlite")
+CACHE_TTL = 30 * 86400  # seconds
 
 
 def parse_args():
@@ -70,20 +145,35 @@ def parse_args():
         default="name",
         help="Column containing gene names (default: name)"
     )
+    parser.add_argument("--cache",
+                       default=DEFAULT_CACHE,
+                       help="SQLite cache of SGD responses, reused for 30 days "
+                            "(default: sgd_cache.sqlite next to this script)")
+    parser.add_argument("--no-cache", dest="cache", action="store_const", const=None,
+                       help="Always query SGD, without reading or updating the cache")
+    parser.add_argument("--bulk", action="store_true",
+                       help="Try the (undocumented) SGD batch locus endpoint before "
+                            "per-gene queries")
     return parser.parse_args()
 
 
-def query_sgd_locus(locus):
-    """Query SGD locus API for a single gene"""
-    url = f"https://www.yeastgenome.org/backend/locus/{locus}"
-    headers = {"accept": "application/json"}
+def progress(items, total):
+    """
+    Yield items while reporting progress on stderr: a rate-limited tqdm bar if
+    installed, else one line every PROGRESS_EVERY items
+    """
+    if tqdm is not None:
+        yield from tqdm(items, total=total, desc="Querying SGD", unit="gene", file=sys.stderr)
+        return
 
-    r = requests.get(url, headers=headers, timeout=30)
-    if r.status_code != 200:
-        return None
+    for done, item in enumerate(items, 1):
+        yield item
+        if done % PROGRESS_EVERY == 0 or done == total:
+            print(f"Queried SGD: {done}/{total}", file=sys.stderr)
 
-    data = r.json()
 
+def parse_locus(locus, data):
+    """Build an output row from an SGD locus JSON record"""
     # ---- robust description handling ----
     desc = None
     description_field = data.get("description")
@@ -105,6 +195,161 @@ def query_sgd_locus(locus):
     }
 
 
+def query_sgd_locus(locus):
+    """Query SGD locus API for a single gene"""
+    url = SGD_LOCUS_URL.format(locus)
+
+    r = _SESSION.get(url, timeout=30)
+    if r.status_code != 200:
+        return None
+
+    return parse_locus(locus, r.json())
+
+
+def query_sgd_bulk(genes):
+    """
+    Query SGD's batch endpoint in chunks of BULK_CHUNK_SIZE genes.
+
+    Expects a JSON object keyed by queried locus. Returns one result (or None)
+    per gene, in order, or None if the endpoint is unavailable so the caller
+    can fall back to per-gene queries.
+    """
+    results = {}
+    for i in range(0, len(genes), BULK_CHUNK_SIZE):
+        chunk = genes[i:i + BULK_CHUNK_SIZE]
+        try:
+            r = _SESSION.post(SGD_BULK_URL, json={"loci": chunk}, timeout=60)
+            if r.status_code != 200:  # 404/405: no batch endpoint
+                return None
+            records = r.json()
+        except (requests.RequestException, ValueError):
+            return None
+        # anything not keyed by the requested loci (e.g. an error wrapper) is
+        # not a batch answer
+        if not isinstance(records, dict) or not any(locus in records for locus in chunk):
+            return None
+
+        for locus in chunk:
+            data = records.get(locus)
+            results[locus] = parse_locus(locus, data) if isinstance(data, dict) else None
+
+    return [results[g] for g in genes]
+
+
+async def fetch_sgd_locus(locus, client, sem):
+    """Async version of query_sgd_locus; sem bounds the number of queries in flight"""
+    async with sem:
+        # same 5xx retry policy as the requests session (the httpx transport
+        # only retries failed connects); the last response is kept either way
+        for attempt in range(MAX_RETRIES + 1):
+            r = await client.get(SGD_LOCUS_URL.format(locus), timeout=30)
+            if r.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                break
+            await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
+        # be polite to SGD servers
+        await asyncio.sleep(QUERY_INTERVAL)
+
+    if r.status_code != 200:
+        return None
+
+    return parse_locus(locus, r.json())
+
+
+async def query_sgd_loci_async(genes):
+    """Query all genes concurrently over one shared (keep-alive) client"""
+    sem = asyncio.Semaphore(MAX_CONCURRENT_QUERIES)
+    limits = httpx.Limits(max_connections=MAX_CONCURRENT_QUERIES)
+    # transport-level retries cover failed connection attempts
+    transport = httpx.AsyncHTTPTransport(retries=3, limits=limits)
+    async with httpx.AsyncClient(headers=SGD_HEADERS, transport=transport) as client:
+        tasks = [asyncio.ensure_future(fetch_sgd_locus(g, client, sem)) for g in genes]
+        for fut in progress(asyncio.as_completed(tasks), len(tasks)):
+            await fut
+        return [t.result() for t in tasks]
+
+
+def open_cache(cache_path):
+    """Open (creating if needed) the SQLite lookup cache"""
+    conn = sqlite3.connect(cache_path)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS sgd_locus "
+        "(locus TEXT PRIMARY KEY, fetched REAL NOT NULL, result TEXT NOT NULL)"
+    )
+    return conn
+
+
+def read_cache(conn, genes):
+    """Return {gene: result} for genes cached within CACHE_TTL"""
+    wanted = set(genes)
+    rows = conn.execute(
+        "SELECT locus, result FROM sgd_locus WHERE fetched >= ?",
+        (time.time() - CACHE_TTL,)
+    )
+    return {locus: json.loads(result) for locus, result in rows if locus in wanted}
+
+
+def write_cache(conn, results):
+    """Store {gene: result} for successful lookups"""
+    now = time.time()
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO sgd_locus (locus, fetched, result) VALUES (?, ?, ?)",
+            [(locus, now, json.dumps(res)) for locus, res in results.items()]
+        )
+
+
+def query_sgd_loci(genes, cache_path=None, bulk=False):
+    """
+    Query SGD for every gene; returns one result (or None) per gene, in order.
+
+    Genes found in the cache at cache_path are not queried again; new
+    successful lookups are added to it. Not-found genes are never cached,
+    so they are retried on the next run. bulk is passed to fetch_sgd_loci.
+    """
+    if cache_path is None:
+        return fetch_sgd_loci(genes, bulk)
+
+    conn = open_cache(cache_path)
+    try:
+        cached = read_cache(conn, genes)
+        todo = [g for g in genes if g not in cached]
+        print(f"SGD cache: {len(cached)} cached, {len(todo)} to query", file=sys.stderr)
+
+        fetched = dict(zip(todo, fetch_sgd_loci(todo, bulk)))
+        write_cache(conn, {g: res for g, res in fetched.items() if res})
+    finally:
+        conn.close()
+
+    return [cached[g] if g in cached else fetched[g] for g in genes]
+
+
+def fetch_sgd_loci(genes, bulk=False):
+    """
+    Query SGD for every gene over the network, one result (or None) per gene.
+    With bulk, tries the batch endpoint first; otherwise uses concurrent async
+    requests when httpx is installed, else a thread pool over the shared
+    requests session.
+    """
+    if not genes:
+        return []
+
+    if bulk:
+        results = query_sgd_bulk(genes)
+        if results is not None:
+            return results
+        print("SGD batch endpoint unavailable; querying genes one by one", file=sys.stderr)
+
+    if httpx is not None:
+        return asyncio.run(query_sgd_loci_async(genes))
+
+    # the GIL is released while waiting on the socket, so threads overlap the
+    # requests; the worker cap bounds how many are in flight at once, not the
+    # request rate (about MAX_CONCURRENT_QUERIES per response round trip, with
+    # no QUERY_INTERVAL pause as on the async path)
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_QUERIES) as pool:
+        return list(progress(pool.map(query_sgd_locus, genes), len(genes)))
+
+
 def main():
     args = parse_args()
 
@@ -142,18 +387,15 @@ def main():
     results = []
     not_found = []
 
-    for gene in genes:
-        print(f"Querying SGD: {gene}", file=sys.stderr)
-        res = query_sgd_locus(gene)
+    for gene, res in zip(genes, query_sgd_loci(genes, cache_path=args.cache, bulk=args.bulk)):
         if res:
             results.append(res)
         else:
             not_found.append(gene)
 
-        # be polite to SGD servers
-        time.sleep(0.2)
-
-    df_out = pd.DataFrame(results)
+    # build the frame once from the collected rows; fixed columns keep the
+    # order stable and still write a header when nothing was found
+    df_out = pd.DataFrame(results, columns=OUTPUT_COLUMNS)
     df_out.to_csv(args.output, index=False)
 
     print(f"\nSaved: {args.output}")
@@ -55,7 +55,7 @@ mkdir -p results/$SAMPLE_NAME
 cp 01_read_processing_and_genomic_composition/*.html results/$SAMPLE_NAME/
 cp 02_locus_enrichment/lola_output/* results/$SAMPLE_NAME/
 cp 03_abundance_quantification/fpkm_out/* results/$SAMPLE_NAME/
-cp 03_abundance_quantification/merged_CPM_table.csv results/$SAMPLE_NAME/
+cp 03_abundance_quantification/merged_CPM_table.* results/$SAMPLE_NAME/
 
 echo "EV-seq analysis complete!"
 echo "Results available in: results/$SAMPLE_NAME/"
\ No newline at end of file